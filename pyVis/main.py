@@ -1,10 +1,10 @@
-import os
+import io
 import subprocess
+from collections import defaultdict
 from pathlib import Path
 import numpy as np
 import sys
-from matplotlib.patches import Circle, Polygon
-from matplotlib.collections import PatchCollection
+from matplotlib.collections import EllipseCollection, PolyCollection
 import matplotlib.pyplot as plt
 import itertools
 
@@ -28,79 +28,94 @@ def getTints():
     return itertools.cycle(tints)
 
 
-def getCircle(args, color):
-    return Circle(
-        (args[0], args[1]), args[2], fill=False, edgecolor=color, linewidth=linewidth
+def getCircles(args, colors, ax):
+    return EllipseCollection(
+        2.0 * args[:, 2],
+        2.0 * args[:, 2],
+        np.zeros(args.shape[0]),
+        units="xy",
+        offsets=args[:, :2],
+        offset_transform=ax.transData,
+        facecolors="none",
+        edgecolors=colors,
+        linewidths=linewidth,
+        rasterized=True,
     )
 
 
-def getPoint(args, color):
-    return np.array([args[0], args[1]])
-    # return Circle((args[0], args[1]), pointSize, fill=True, facecolor=color)
-
-
-def getPolygon(args, color):
-    numPoints = len(args) // 2
-    ps = np.zeros((numPoints, 2))
-    for i in range(numPoints):
-        ps[i, 0] = args[2 * i]
-        ps[i, 1] = args[2 * i + 1]
-
-    return Polygon(
-        ps, closed=True, linewidth=linewidth, linestyle="-", edgecolor=color, fill=False
+def getPolygons(args, colors):
+    ps = args.reshape(args.shape[0], -1, 2)
+    return PolyCollection(
+        ps,
+        closed=True,
+        facecolors="none",
+        edgecolors=colors,
+        linewidths=linewidth,
+        linestyle="-",
+        rasterized=True,
     )
 
 
 def mix(c1, c2):
-    return [0.5 * (c1[0] + c2[0]), 0.5 * (c1[1] + c2[1]), 0.5 * (c1[2] + c2[2]), c1[3]]
+    mixed = 0.5 * (c1 + np.asarray(c2))
+    mixed[:, 3] = c1[:, 3]
+    return mixed
 
 
-def getColor(split, tint):
-    if len(split) == 1:
-        color = defaultColor
-    elif len(split) == 2:
-        color = [float(x) for x in split[1].split(" ")]
-    else:
-        raise ValueError
+def getColors(colors, tint):
     if tint is not None:
-        return mix(color, tint)
+        return mix(colors, tint)
     else:
-        return color
+        return colors
 
 
-def getPatch(line, tint):
-    split = line.split(" color ")
-    args = split[0].split(" ")
-    type_ = args[0]
-    args = [float(x) for x in args[1:]]
-    color = getColor(split, tint)
-    if type_ == "Circle":
-        return getCircle(args, color)
-    elif type_ == "Polygon":
-        return getPolygon(args, color)
-    elif type_ == "Point":
-        return getPoint(args, color)
-    raise NotImplementedError()
+# Groups the lines by type and number of columns and parses each
+# group into a single array at once instead of token by token.
+def readRecords(fname):
+    groups = defaultdict(list)
+    with open(fname, "r") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line == "":
+                continue
+            type_, rest = line.split(" ", 1)
+            hasColor = " color " in rest
+            rest = rest.replace(" color ", " ")
+            groups[(type_, rest.count(" ") + 1, hasColor)].append(rest)
+    return [
+        (type_, hasColor, np.loadtxt(io.StringIO("\n".join(lines)), ndmin=2))
+        for (type_, _, hasColor), lines in groups.items()
+    ]
 
 
-def addPatchesForFile(fname, tint=None):
-    patches = []
-    points = []
+def splitColors(data, hasColor):
+    if hasColor:
+        return data[:, :-4], data[:, -4:]
+    else:
+        return data, np.tile(defaultColor, (data.shape[0], 1))
 
-    with open(fname, "r") as f:
-        for line in f.readlines():
-            patch = getPatch(line, tint)
-            if type(patch) == np.ndarray:
-                points.append(patch)
-            else:
-                if patch is not None:
-                    patches.append(patch)
 
-    return PatchCollection(patches, match_original=True), np.array(points)
+def addPatchesForFile(ax, fname, tint=None):
+    points = [np.zeros((0, 2))]
+
+    for type_, hasColor, data in readRecords(fname):
+        args, colors = splitColors(data, hasColor)
+        colors = getColors(colors, tint)
+        if type_ == "Point":
+            points.append(args[:, :2])
+        elif type_ == "Circle":
+            ax.add_collection(getCircles(args, colors, ax))
+        elif type_ == "Polygon":
+            ax.add_collection(getPolygons(args, colors))
+        else:
+            raise NotImplementedError()
 
+    points = np.vstack(points)
+    ax.scatter(points[:, 0], points[:, 1], color=tint, s=1.0, rasterized=True)
 
-def plotFiles(fnames, tints, outFile, show=True):
-    fig, ax = plt.subplots()
+
+def plotFiles(ax, fnames, tints, outFile, show=True):
+    ax.cla()
     if onlyBox:
         ax.set_xlim(length * np.array([0.0, 1.0]))
         ax.set_ylim(length * np.array([0.0, 1.0]))
@@ -109,26 +124,19 @@ def plotFiles(fnames, tints, outFile, show=True):
         ax.set_ylim(length * np.array([-1.0, 2.0]))
 
     for fname, tint in zip(fnames, tints):
-        collection, points = addPatchesForFile(fname, tint)
-        ax.add_collection(collection)
-        ax.scatter(points[:, 0], points[:, 1], color=tint, s=1.0)
+        addPatchesForFile(ax, fname, tint)
     if show:
         plt.show()
     else:
         dirname = Path(fname)
         outFile.parent.mkdir(exist_ok=True)
         out = outFile
-        plt.savefig(out, dpi=800)
+        ax.figure.savefig(out, dpi=800, bbox_inches="tight")
         showImageInTerminal(outFile)
-    fig.clf()
 
 
 def getFilesInDir(dirname):
-    def f():
-        for f in os.listdir(dirname):
-            yield dirname / f
-
-    return list(f())
+    return sorted(dirname.iterdir())
 
 
 def showImageInTerminal(path: Path) -> None:
@@ -160,12 +168,14 @@ dirnames = args[1:]
 
 dirnames = [Path(x) for x in dirnames]
 
-numFiles = len(getFilesInDir(dirnames[0]))
 files = getFilesInDir(dirnames[0])
-files.sort()
+fig, ax = plt.subplots()
 for num, f in enumerate(files):
+    # The figure is reused for every frame, unless showing it closed it
+    if not plt.fignum_exists(fig.number):
+        fig, ax = plt.subplots()
     fnames = [d / f.name for d in dirnames]
     outFile = (out / f"{num:03}").with_suffix(".png")
     print(fnames)
     print(outFile)
-    plotFiles(fnames, getTints(), outFile, show=show)
+    plotFiles(ax, fnames, getTints(), outFile, show=show)